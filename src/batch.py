@@ -0,0 +1,151 @@
+"""
+Batch question answering for evaluation and offline runs.
+
+usage: python -m src.batch questions.jsonl answers.jsonl [--collection docs] [--concurrency 4]
+
+every input line is a json object with a "question" (and optionally an "id"),
+every output line has the answer (or the error that prevented one), the
+retrieved ids, the llm latency and the average retrieval time of the batch.
+answers are written in the order of the questions, so two runs can be diffed.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any
+
+from dotenv import load_dotenv
+
+from .config import Config
+
+
+class RateLimiter:
+    """Spaces out calls so that at most max_per_minute of them start each minute"""
+
+    def __init__(self, max_per_minute: int):
+        self.interval = 60.0 / max_per_minute if max_per_minute > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        # reserve the next slot under the lock, sleep outside it.
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+
+def read_questions(path: str) -> List[Dict[str, Any]]:
+    questions = []
+    with open(path) as f:
+        for i, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "question" not in record:
+                raise ValueError(f"Line {i+1} of {path} has no \"question\" field")
+            record.setdefault("id", f"q_{i}")
+            questions.append(record)
+    return questions
+
+
+def run_batch(
+        store,
+        questions: List[Dict[str, Any]],
+        output_path: str,
+        k: int = None,
+        concurrency: int = None) -> int:
+    # imported here so the llm only gets created once the api key is in the environment.
+    from .chat import get_respo
+    from .vectors import query_batch, QUERY_K
+
+    config = Config()
+    # same k as the chat path, so the evaluation measures what users get.
+    k = k or QUERY_K
+    concurrency = concurrency or config.BATCH_CONCURRENCY
+
+    if not questions:
+        return 0
+
+    # retrieval for every question at once: one embedding call, one search.
+    # that makes per-question retrieval time unmeasurable, so the batch average is reported.
+    start = time.perf_counter()
+    all_results = query_batch(store, [q["question"] for q in questions], k=k)
+    retrieval_s_avg = (time.perf_counter() - start) / len(questions)
+
+    limiter = RateLimiter(config.MAX_REQUESTS_PER_MINUTE)
+
+    def answer(question: Dict[str, Any], results) -> Dict[str, Any]:
+        processed_results = [
+                {"content": doc.page_content, "metadata": doc.metadata}
+                for doc in results
+                ]
+
+        # without results get_respo answers without calling the llm, no rate limit slot needed.
+        if results:
+            limiter.wait()
+        start = time.perf_counter()
+        # failures (rate limits, timeouts...) go into "error" so they can't pass as answers.
+        try:
+            response, error = get_respo(question["question"], processed_results, [], raise_errors=True), None
+        except Exception as e:
+            response, error = None, f"{type(e).__name__}: {str(e)}"
+        latency_s = time.perf_counter() - start
+
+        return {
+                "id": question["id"],
+                "question": question["question"],
+                "answer": response,
+                "error": error,
+                "retrieved_ids": [doc.id or doc.metadata.get("id") for doc in results],
+                "retrieval_s_avg": round(retrieval_s_avg, 4),
+                "latency_s": round(latency_s, 4)
+                }
+
+    # answers are written in input order as soon as every earlier one is done,
+    # so a long run can still be followed with tail -f.
+    written = 0
+    failed = 0
+    with open(output_path, "w") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(answer, q, results) for q, results in zip(questions, all_results)]
+        for future in futures:
+            record = future.result()
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            written += 1
+            failed += record["error"] is not None
+
+    if failed:
+        print(f"{failed} of {written} questions failed, see the \"error\" field in {output_path}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions against a collection")
+    parser.add_argument("input", help="JSONL file with one {\"question\": ...} per line")
+    parser.add_argument("output", help="JSONL file to write the answers to")
+    parser.add_argument("--collection", default="docs", help="collection to query")
+    parser.add_argument("--backend", default=None, help="vector store backend, chroma or numpy")
+    parser.add_argument("-k", type=int, default=None, help="documents retrieved per question")
+    parser.add_argument("--concurrency", type=int, default=None, help="llm calls in flight at once")
+    args = parser.parse_args()
+
+    # same .env as the streamlit app.
+    load_dotenv(dotenv_path=Path(__file__).parent.parent / ".env")
+
+    from .vectors import setup_vs
+
+    store = setup_vs(os.getenv("GEMINI_API_KEY"), collection_name=args.collection, backend=args.backend)
+    questions = read_questions(args.input)
+
+    start = time.perf_counter()
+    written = run_batch(store, questions, args.output, k=args.k, concurrency=args.concurrency)
+    print(f"Answered {written} questions in {time.perf_counter() - start:.1f}s, written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
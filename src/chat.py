@@ -34,8 +34,10 @@ llm = ChatGoogleGenerativeAI(
 def get_respo(
         query: str,
         results: List[Dict],
-        chat_history: List[Dict[str,str]] ) -> str:
+        chat_history: List[Dict[str,str]],
+        raise_errors: bool = False) -> str:
     # generate the response to a user query.
+    # raise_errors lets callers like the batch mode see the real exception instead of the apology text.
         try:
             # retrives relevant documents.
 
@@ -124,6 +126,8 @@ Please provide a comprehensive answer based on the context above. If the context
             return respo.content
 
         except Exception as e:
+            if raise_errors:
+                raise
             return f"Sorry Sir, but there is an error while processing the questoins through the llm: {str(e)}"
 
 def analyze_image_with_query(self, image_base64: str, query: str) -> str:
@@ -33,7 +33,21 @@ class Config:
     # ChromaDB Configuration
     CHROMA_DB_PATH: str = "./chroma_db"
     COLLECTION_NAME: str = "gemini_rag_collection"
+
+    # Vector store backend, "chroma" or "numpy"
+    VECTOR_BACKEND: str = field(default_factory=lambda: os.getenv("VECTOR_BACKEND", "chroma"))
+
+    # NumPy backend Configuration
+    NUMPY_DB_PATH: str = "./numpy_db"
+    NUMPY_DTYPE: str = "float16"  # "float16" or "int8"
+    NUMPY_COMPACT_RATIO: float = 0.25  # compact once this fraction of rows is deleted
     
+    # Embedding Cache Configuration (shared by every collection)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "./embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_MB: int = 512
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 10000
+
     # Processing Configuration
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
@@ -46,6 +60,9 @@ class Config:
     # Rate Limiting (Free Tier Limits)
     MAX_REQUESTS_PER_MINUTE: int = 10
     MAX_TOKENS_PER_REQUEST: int = 32768
+
+    # Batch Question Answering
+    BATCH_CONCURRENCY: int = 4
     
 
     
@@ -65,6 +82,23 @@ class Config:
             "collection_name": self.COLLECTION_NAME
         }
     
+    def get_numpy_config(self) -> Dict[str, Any]:
+        """Get configuration for the NumPy vector store"""
+        return {
+            "persist_directory": self.NUMPY_DB_PATH,
+            "dtype": self.NUMPY_DTYPE,
+            "compact_ratio": self.NUMPY_COMPACT_RATIO
+        }
+    
+    def get_embedding_cache_config(self) -> Dict[str, Any]:
+        """Get configuration for the embedding cache"""
+        return {
+            "model_name": self.EMBEDDING_MODEL,
+            "path": self.EMBEDDING_CACHE_PATH,
+            "max_bytes": self.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+            "memory_items": self.EMBEDDING_CACHE_MEMORY_ITEMS
+        }
+    
     def validate(self) -> bool:
         """Validate configuration"""
         if not self.GEMINI_API_KEY:
@@ -0,0 +1,265 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+# last_used updates are held back until this many hits or seconds pile up.
+TOUCH_FLUSH_ITEMS = 256
+TOUCH_FLUSH_SECONDS = 60.0
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding function with a content-hash keyed cache.
+
+    Vectors live in a sqlite file so they survive restarts and are shared by
+    every collection, with a small LRU dict of float32 arrays in front of it.
+    The model name is part of every key so switching models never reuses old
+    vectors. When the pages in use grow past max_bytes the least recently
+    used entries are evicted and the freed pages are handed back to the file
+    system. The cache is best effort: if sqlite fails, texts are embedded as
+    if they were never cached.
+    """
+
+    def __init__(
+            self,
+            underlying: Embeddings,
+            model_name: str,
+            path: str = "./embedding_cache.sqlite3",
+            max_bytes: int = 512 * 1024 * 1024,
+            memory_items: int = 10000):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+        # without a usable database the cache just stays in memory.
+        self._db: Optional[sqlite3.Connection] = None
+        try:
+            self._db = self._connect(path)
+        except sqlite3.Error as e:
+            print(f"Embedding cache disabled, could not open {path}: {str(e)}")
+
+    def _connect(self, path: str) -> sqlite3.Connection:
+        # streamlit reruns the script on different threads, the lock guards the connection.
+        # every session opens its own connection, WAL and the timeout let them share the file.
+        db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        try:
+            # auto_vacuum has to be set before the first table exists (or be applied by a VACUUM).
+            db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            db.execute(
+                    """CREATE TABLE IF NOT EXISTS embeddings (
+                        key TEXT PRIMARY KEY,
+                        model TEXT NOT NULL,
+                        vector BLOB NOT NULL,
+                        size INTEGER NOT NULL,
+                        last_used REAL NOT NULL
+                    )"""
+                    )
+            db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            db.commit()
+            if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                try:
+                    db.execute("VACUUM")
+                except sqlite3.OperationalError as e:
+                    # another connection holds the file, the file just won't shrink until a later open manages it.
+                    print(f"Embedding cache could not enable incremental vacuum: {str(e)}")
+            db.execute("PRAGMA journal_mode = WAL")
+        except sqlite3.Error:
+            db.close()
+            raise
+        return db
+
+    def _key(self, text: str, task: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{task}\0{text}".encode("utf-8")).hexdigest()
+
+    # cache access
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        missing = []
+        for key in set(keys):
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+            else:
+                missing.append(key)
+
+        if self._db is None:
+            return found
+
+        # sqlite caps the number of bound parameters, so look up in chunks.
+        try:
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(chunk))})",
+                        [self.model_name, *chunk]
+                        ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+        except sqlite3.Error as e:
+            print(f"Embedding cache lookup failed, embedding without it: {str(e)}")
+
+        now = time.time()
+        for key in found:
+            self._touched[key] = now
+        if (len(self._touched) >= TOUCH_FLUSH_ITEMS
+                or time.monotonic() - self._last_flush >= TOUCH_FLUSH_SECONDS):
+            self._flush_touched()
+        return found
+
+    def _flush_touched(self):
+        touched, self._touched = self._touched, {}
+        self._last_flush = time.monotonic()
+        if not touched or self._db is None:
+            return
+        try:
+            self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(last_used, key) for key, last_used in touched.items()]
+                    )
+            self._db.commit()
+        except sqlite3.Error as e:
+            # only the eviction order suffers, not worth failing a query over.
+            self._rollback()
+            print(f"Embedding cache could not update usage times: {str(e)}")
+
+    def _rollback(self):
+        try:
+            self._db.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _store(self, vectors: Dict[str, np.ndarray]):
+        now = time.time()
+        rows = []
+        for key, vector in vectors.items():
+            blob = vector.tobytes()
+            rows.append((key, self.model_name, blob, len(blob), now))
+            self._remember(key, vector)
+            self._touched.pop(key, None)
+
+        if self._db is None:
+            return
+
+        try:
+            self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                    )
+            self._db.commit()
+        except sqlite3.Error as e:
+            self._rollback()
+            print(f"Embedding cache could not store new embeddings: {str(e)}")
+            return
+
+        # piggyback the pending usage times on this write.
+        self._flush_touched()
+        try:
+            self._evict()
+        except sqlite3.Error as e:
+            self._rollback()
+            print(f"Embedding cache eviction failed: {str(e)}")
+
+    def _used_bytes(self) -> int:
+        # pages actually holding data, read from the file header so it costs nothing.
+        page_size = self._db.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self._db.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self._db.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def _evict(self):
+        # blob sizes undercount the page overhead, so repeat until the pages fit.
+        used = self._used_bytes()
+        while used > self.max_bytes:
+            # evict down to 90% so we are not back here on the very next insert.
+            excess = used - int(self.max_bytes * 0.9)
+            freed = 0
+            evicted = []
+            for key, size in self._db.execute("SELECT key, size FROM embeddings ORDER BY last_used"):
+                evicted.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            if not evicted:
+                return
+
+            self._db.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+            self._db.commit()
+            # give the freed pages back so the file itself shrinks.
+            self._db.execute("PRAGMA incremental_vacuum")
+            self._db.commit()
+            for (key,) in evicted:
+                self._memory.pop(key, None)
+            used = self._used_bytes()
+
+    def _embed(
+            self,
+            texts: List[str],
+            task: str,
+            embed_misses: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        keys = [self._key(text, task) for text in texts]
+
+        with self._lock:
+            found = self._lookup(keys)
+
+        # identical texts inside one call are embedded only once.
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                misses.setdefault(key, text)
+
+        if misses:
+            # the api call happens outside the lock.
+            new_vectors = {
+                    key: np.asarray(vector, dtype=np.float32)
+                    for key, vector in zip(misses, embed_misses(list(misses.values())))
+                    }
+            with self._lock:
+                self._store(new_vectors)
+            found.update(new_vectors)
+
+        return [found[key].tolist() for key in keys]
+
+    # Embeddings interface
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document", self.underlying.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query", lambda misses: [self.underlying.embed_query(misses[0])])[0]
+
+    def embed_queries(
+            self,
+            texts: List[str],
+            embed_misses: Optional[Callable[[List[str]], List[List[float]]]] = None) -> List[List[float]]:
+        """Cached bulk query embedding, embed_misses does the actual call for the uncached ones"""
+        if embed_misses is None:
+            embed_misses = lambda misses: [self.underlying.embed_query(text) for text in misses]
+        return self._embed(texts, "query", embed_misses)
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,576 @@
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import fcntl
+except ImportError:
+    # no flock on windows, there only the in-process lock protects the files.
+    fcntl = None
+
+
+# meta.json is the commit record, it names the file set and how much of it is valid.
+META_FILE = "meta.json"
+# flock'ed by every instance, shared for reads and exclusive for writes.
+LOCK_FILE = "lock"
+
+SUPPORTED_DTYPES = ("float16", "int8")
+
+# rows scored at once, keeps the float32 copy of a block around 25MB at 768 dims.
+SEARCH_BLOCK_ROWS = 8192
+# queries scored at once against a block.
+SEARCH_BLOCK_QUERIES = 256
+
+
+_shared_stores: Dict[Tuple[str, str], "NumpyVectorStore"] = {}
+_shared_stores_lock = threading.Lock()
+
+
+def shared_store(
+        collection_name: str,
+        embedding_function: Embeddings,
+        persist_directory: str = "./numpy_db",
+        **kwargs: Any) -> "NumpyVectorStore":
+    """Returns the one NumpyVectorStore of this process for a collection directory"""
+    key = (os.path.realpath(persist_directory), collection_name)
+    with _shared_stores_lock:
+        if key not in _shared_stores:
+            _shared_stores[key] = NumpyVectorStore(collection_name, embedding_function, persist_directory, **kwargs)
+        return _shared_stores[key]
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class NumpyVectorStore(VectorStore):
+    """In-process vector store backed by a memory-mapped embedding matrix.
+
+    Embeddings are L2 normalised and stored as float16 (or int8 with a
+    per-row scale) in a flat file, so a search is an exact cosine top-k done
+    with a matrix product. Deletes only mark rows in a tombstone bitmap, the
+    files get rewritten by compact() once enough rows are dead.
+
+    Unlike Chroma, scores from similarity_search_with_score are cosine
+    similarities (higher is closer) and metadata filters are not supported.
+
+    Every file is only ever appended to past the length recorded in
+    meta.json, and meta.json is replaced last, so a failed or killed write
+    leaves the previous state intact. Anything past the recorded length is
+    cut off again when the collection is opened and before the next append.
+
+    Several instances (or processes) can share a directory: they flock a lock
+    file around every read and write and re-read meta.json under it. Within
+    one process, use shared_store() so sessions share a single instance.
+    """
+
+    def __init__(
+            self,
+            collection_name: str,
+            embedding_function: Embeddings,
+            persist_directory: str = "./numpy_db",
+            dtype: str = "float16",
+            compact_ratio: float = 0.25):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"dtype must be one of {SUPPORTED_DTYPES}, got {dtype}")
+
+        self._embedding_function = embedding_function
+        self.path = os.path.join(persist_directory, collection_name)
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+
+        os.makedirs(self.path, exist_ok=True)
+        self._lock_fd = os.open(self._file(LOCK_FILE), os.O_RDWR | os.O_CREAT)
+
+        with self._locked():
+            # recovery is destructive, so it only ever runs under the exclusive lock.
+            self._set_meta(self._read_meta(), dtype)
+            self._truncate_to_committed()
+            self._remove_stale_files()
+            self._load_state()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    # locking
+
+    @contextmanager
+    def _locked(self, shared: bool = False):
+        """Thread lock plus flock on the lock file, re-entrant within one instance"""
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    # loading / saving
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _version_file(self, kind: str, version: int = None) -> str:
+        version = self.version if version is None else version
+        extension = "jsonl" if kind in ("docs", "ids") else "bin"
+        return self._file(f"{kind}.{version}.{extension}")
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._file(META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _set_meta(self, meta: Optional[Dict[str, Any]], dtype: str = None):
+        if meta is not None:
+            # an existing collection keeps whatever dtype it was created with.
+            self.dtype = meta["dtype"]
+            self.dim = meta["dim"]
+            self.count = meta["count"]
+            self.version = meta["version"]
+            self.docs_bytes = meta["docs_bytes"]
+            self.ids_bytes = meta["ids_bytes"]
+            self.deleted_file = meta["deleted_file"]
+        else:
+            self.dtype = dtype or self.dtype
+            self.dim = None
+            self.count = 0
+            self.version = 0
+            self.docs_bytes = 0
+            self.ids_bytes = 0
+            self.deleted_file = None
+
+    def _load_state(self):
+        # ids are small, the documents themselves are only read for hits.
+        self._ids: List[str] = []
+        if self.count:
+            with open(self._version_file("ids"), "rb") as f:
+                self._ids = [json.loads(line) for line in f.read(self.ids_bytes).splitlines()]
+
+        self._deleted = np.zeros(self.count, dtype=bool)
+        if self.deleted_file:
+            packed = np.load(self._file(self.deleted_file))
+            self._deleted = np.unpackbits(packed, count=self.count).astype(bool)
+
+        self._row_of = {
+                doc_id: row for row, doc_id in enumerate(self._ids)
+                if not self._deleted[row]
+                }
+        self._open_matrix()
+
+    def _refresh(self):
+        """Pick up whatever another instance committed, called with the lock held"""
+        meta = self._read_meta()
+        if meta is None:
+            return
+        if (meta["version"], meta["count"], meta["deleted_file"]) != (self.version, self.count, self.deleted_file):
+            self._set_meta(meta)
+            self._load_state()
+
+    def _committed_sizes(self) -> Dict[str, int]:
+        row_bytes = np.dtype(self.dtype).itemsize * (self.dim or 0)
+        sizes = {
+                "vectors": self.count * row_bytes,
+                "offsets": self.count * 8,
+                "docs": self.docs_bytes,
+                "ids": self.ids_bytes
+                }
+        if self.dtype == "int8":
+            sizes["scales"] = self.count * 4
+        return sizes
+
+    def _truncate_to_committed(self):
+        """Cut off whatever a failed write left past the committed length"""
+        for kind, size in self._committed_sizes().items():
+            path = self._version_file(kind)
+            # "ab" creates the file if needed without touching its contents.
+            with open(path, "ab") as f:
+                if f.tell() > size:
+                    f.truncate(size)
+
+    def _remove_stale_files(self):
+        keep = {META_FILE, LOCK_FILE, self.deleted_file}
+        keep.update(os.path.basename(self._version_file(kind)) for kind in self._committed_sizes())
+        for name in os.listdir(self.path):
+            if name not in keep:
+                os.remove(self._file(name))
+
+    def _open_matrix(self):
+        self._vectors = None
+        self._scales = None
+        self._offsets = None
+        if not self.count:
+            return
+
+        self._vectors = np.memmap(
+                self._version_file("vectors"),
+                dtype=self.dtype,
+                mode="r",
+                shape=(self.count, self.dim)
+                )
+        self._offsets = np.memmap(
+                self._version_file("offsets"),
+                dtype=np.int64,
+                mode="r",
+                shape=(self.count,)
+                )
+        if self.dtype == "int8":
+            self._scales = np.memmap(
+                    self._version_file("scales"),
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(self.count,)
+                    )
+
+    def _write_deleted(self, deleted: np.ndarray) -> str:
+        # a fresh name every time, it only becomes live once meta.json points at it.
+        name = f"deleted.{uuid.uuid4().hex}.npy"
+        with open(self._file(name), "wb") as f:
+            np.save(f, np.packbits(deleted))
+            _sync(f)
+        return name
+
+    def _commit(self, count: int, version: int, docs_bytes: int, ids_bytes: int, deleted_file: str):
+        # every file meta.json names has been fsynced by now.
+        meta = {
+                "dtype": self.dtype,
+                "dim": self.dim,
+                "count": count,
+                "version": version,
+                "docs_bytes": docs_bytes,
+                "ids_bytes": ids_bytes,
+                "deleted_file": deleted_file
+                }
+        tmp_path = self._file(META_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+            _sync(f)
+        os.replace(tmp_path, self._file(META_FILE))
+        self._sync_dir()
+
+        old_deleted_file = self.deleted_file
+        self._set_meta(meta)
+        if old_deleted_file and old_deleted_file != deleted_file:
+            try:
+                os.remove(self._file(old_deleted_file))
+            except FileNotFoundError:
+                pass
+
+    def _sync_dir(self):
+        # makes the rename of meta.json itself durable.
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(self.path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # encoding
+
+    def _normalize(self, vectors) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _encode(self, matrix: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.dtype == "float16":
+            return matrix.astype(np.float16), None
+
+        # symmetric per-row quantization, score = (row . query) * scale
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    # writes
+
+    def _append(self, kind: str, at: int, data: bytes):
+        with open(self._version_file(kind), "r+b") as f:
+            f.truncate(at)
+            f.seek(at)
+            f.write(data)
+            _sync(f)
+
+    def add_texts(
+            self,
+            texts: Iterable[str],
+            metadatas: Optional[List[dict]] = None,
+            *,
+            ids: Optional[List[str]] = None,
+            **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+
+        # the same id twice in one call keeps only the last one, like an upsert would.
+        last_index = {doc_id: i for i, doc_id in enumerate(ids)}
+        keep = sorted(last_index.values())
+        texts = [texts[i] for i in keep]
+        metadatas = [metadatas[i] for i in keep]
+        unique_ids = [ids[i] for i in keep]
+
+        # serialise everything up front so a bad metadata value fails before any file is touched.
+        doc_lines = [
+                (json.dumps({"text": text, "metadata": metadata}) + "\n").encode("utf-8")
+                for text, metadata in zip(texts, metadatas)
+                ]
+        id_lines = "".join(json.dumps(doc_id) + "\n" for doc_id in unique_ids).encode("utf-8")
+
+        matrix = self._normalize(self._embedding_function.embed_documents(texts))
+
+        with self._locked():
+            # sizes and tombstones have to come from the latest commit, not from this instance.
+            self._refresh()
+            new_collection = self.dim is None
+            if new_collection:
+                self.dim = matrix.shape[1]
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"Embedding size {matrix.shape[1]} does not match collection size {self.dim}")
+
+            try:
+                self._write_rows(matrix, doc_lines, id_lines, unique_ids)
+            except Exception:
+                if new_collection:
+                    self.dim = None
+                raise
+
+        return ids
+
+    def _write_rows(self, matrix: np.ndarray, doc_lines: List[bytes], id_lines: bytes, unique_ids: List[str]):
+        # called with the exclusive lock held.
+        sizes = self._committed_sizes()
+        rows, scales = self._encode(matrix)
+
+        line_ends = np.cumsum([len(line) for line in doc_lines], dtype=np.int64)
+        offsets = self.docs_bytes + np.concatenate([[0], line_ends[:-1]]).astype(np.int64)
+
+        self._append("vectors", sizes["vectors"], rows.tobytes())
+        if scales is not None:
+            self._append("scales", sizes["scales"], scales.tobytes())
+        self._append("offsets", sizes["offsets"], offsets.tobytes())
+        self._append("docs", sizes["docs"], b"".join(doc_lines))
+        self._append("ids", sizes["ids"], id_lines)
+
+        # adding an id that already exists replaces the old row.
+        deleted = np.concatenate([self._deleted, np.zeros(len(doc_lines), dtype=bool)])
+        for doc_id in unique_ids:
+            if doc_id in self._row_of:
+                deleted[self._row_of[doc_id]] = True
+
+        deleted_file = self._write_deleted(deleted)
+        self._commit(
+                self.count + len(doc_lines),
+                self.version,
+                self.docs_bytes + int(line_ends[-1]),
+                self.ids_bytes + len(id_lines),
+                deleted_file
+                )
+
+        # only now that the write is committed does the in-memory state move.
+        first_row = len(self._ids)
+        for i, doc_id in enumerate(unique_ids):
+            self._row_of[doc_id] = first_row + i
+        self._ids.extend(unique_ids)
+        self._deleted = deleted
+        self._open_matrix()
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return None
+
+        with self._locked():
+            self._refresh()
+            rows = [self._row_of[doc_id] for doc_id in set(ids) if doc_id in self._row_of]
+            if not rows:
+                return False
+
+            deleted = self._deleted.copy()
+            deleted[rows] = True
+            self._commit(self.count, self.version, self.docs_bytes, self.ids_bytes, self._write_deleted(deleted))
+
+            self._deleted = deleted
+            for row in rows:
+                del self._row_of[self._ids[row]]
+
+            if self._deleted.sum() >= self.compact_ratio * self.count:
+                self.compact()
+        return True
+
+    def compact(self):
+        """Rewrite the collection into a new file set without the tombstoned rows"""
+        with self._locked():
+            self._refresh()
+            if not self._deleted.any():
+                return
+
+            live_rows = np.flatnonzero(~self._deleted)
+            version = self.version + 1
+
+            with open(self._version_file("vectors", version), "wb") as f:
+                for start in range(0, len(live_rows), SEARCH_BLOCK_ROWS):
+                    f.write(np.ascontiguousarray(self._vectors[live_rows[start:start + SEARCH_BLOCK_ROWS]]).tobytes())
+                _sync(f)
+            if self._scales is not None:
+                with open(self._version_file("scales", version), "wb") as f:
+                    f.write(np.ascontiguousarray(self._scales[live_rows]).tobytes())
+                    _sync(f)
+
+            offsets = np.empty(len(live_rows), dtype=np.int64)
+            docs_bytes = 0
+            with open(self._version_file("docs"), "rb") as src, open(self._version_file("docs", version), "wb") as dst:
+                for i, row in enumerate(live_rows):
+                    src.seek(int(self._offsets[row]))
+                    line = src.readline()
+                    dst.write(line)
+                    offsets[i] = docs_bytes
+                    docs_bytes += len(line)
+                _sync(dst)
+            with open(self._version_file("offsets", version), "wb") as f:
+                f.write(offsets.tobytes())
+                _sync(f)
+
+            ids = [self._ids[row] for row in live_rows]
+            id_lines = "".join(json.dumps(doc_id) + "\n" for doc_id in ids).encode("utf-8")
+            with open(self._version_file("ids", version), "wb") as f:
+                f.write(id_lines)
+                _sync(f)
+
+            # the new file set only goes live when meta.json points at it.
+            deleted = np.zeros(len(ids), dtype=bool)
+            self._commit(len(ids), version, docs_bytes, len(id_lines), self._write_deleted(deleted))
+
+            self._ids = ids
+            self._row_of = {doc_id: row for row, doc_id in enumerate(ids)}
+            self._deleted = deleted
+            self._open_matrix()
+            self._remove_stale_files()
+
+    # reads
+
+    def _read_documents(self, rows: Iterable[int]) -> Dict[int, Document]:
+        documents = {}
+        with open(self._version_file("docs"), "rb") as f:
+            for row in rows:
+                f.seek(int(self._offsets[row]))
+                record = json.loads(f.readline())
+                documents[row] = Document(page_content=record["text"], metadata=record["metadata"], id=self._ids[row])
+        return documents
+
+    def get_by_ids(self, ids: List[str], /) -> List[Document]:
+        with self._locked(shared=True):
+            self._refresh()
+            rows = [self._row_of[doc_id] for doc_id in ids if doc_id in self._row_of]
+            documents = self._read_documents(rows)
+        return [documents[row] for row in rows]
+
+    def _top_k(self, queries: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        """Exact cosine top-k for a batch of normalised query vectors"""
+        k = min(k, self.count - int(self._deleted.sum()))
+        if self._vectors is None or k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query size {queries.shape[1]} does not match collection size {self.dim}")
+
+        # running best k per query, merged with each block's own best k.
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+
+        for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+            stop = min(start + SEARCH_BLOCK_ROWS, self.count)
+            block = np.asarray(self._vectors[start:stop], dtype=np.float32)
+            dead = self._deleted[start:stop]
+            block_k = min(k, stop - start)
+
+            for q_start in range(0, len(queries), SEARCH_BLOCK_QUERIES):
+                q_stop = min(q_start + SEARCH_BLOCK_QUERIES, len(queries))
+                scores = queries[q_start:q_stop] @ block.T
+                if self._scales is not None:
+                    scores *= self._scales[start:stop]
+                scores[:, dead] = -np.inf
+
+                candidates = np.argpartition(scores, -block_k, axis=1)[:, -block_k:]
+                merged_scores = np.concatenate(
+                        [best_scores[q_start:q_stop], np.take_along_axis(scores, candidates, axis=1)], axis=1)
+                merged_rows = np.concatenate([best_rows[q_start:q_stop], candidates + start], axis=1)
+
+                keep = np.argpartition(merged_scores, -k, axis=1)[:, -k:]
+                best_scores[q_start:q_stop] = np.take_along_axis(merged_scores, keep, axis=1)
+                best_rows[q_start:q_stop] = np.take_along_axis(merged_rows, keep, axis=1)
+
+        hits = []
+        for row_scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-row_scores)
+            hits.append([
+                    (int(rows[i]), float(row_scores[i])) for i in order
+                    if rows[i] >= 0 and np.isfinite(row_scores[i])
+                    ])
+        return hits
+
+    def _check_search_kwargs(self, kwargs: Dict[str, Any]):
+        if kwargs:
+            raise ValueError(f"NumpyVectorStore does not support search arguments: {', '.join(kwargs)}")
+
+    def similarity_search_by_vectors(
+            self,
+            embeddings: List[List[float]],
+            k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """Batched search, returns (document, cosine similarity) pairs per query"""
+        queries = self._normalize(embeddings)
+        with self._locked(shared=True):
+            self._refresh()
+            all_hits = self._top_k(queries, k)
+            documents = self._read_documents({row for hits in all_hits for row, _ in hits})
+        return [[(documents[row], score) for row, score in hits] for hits in all_hits]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        # note: the score is a cosine similarity, higher is closer (Chroma returns a distance).
+        self._check_search_kwargs(kwargs)
+        return self.similarity_search_by_vectors([self._embedding_function.embed_query(query)], k)[0]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        self._check_search_kwargs(kwargs)
+        return [doc for doc, _ in self.similarity_search_by_vectors([embedding], k)[0]]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # scores are already cosine similarities, map [-1, 1] onto [0, 1].
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(
+            cls,
+            texts: List[str],
+            embedding: Embeddings,
+            metadatas: Optional[List[dict]] = None,
+            *,
+            ids: Optional[List[str]] = None,
+            collection_name: str = "docs",
+            **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(collection_name=collection_name, embedding_function=embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
@@ -6,9 +6,15 @@ from typing import List, Dict, Any
 import os
 
 from .config import Config
+from .numpy_store import NumpyVectorStore, shared_store
+from .embedding_cache import CachedEmbeddings
 
 
-def setup_vs(api_key=None, collection_name: str = "docs"):
+# documents retrieved per question, shared by the chat and batch paths.
+QUERY_K = 4
+
+
+def setup_vs(api_key=None, collection_name: str = "docs", backend: str = None):
  # Evaluate the API key at CALL time, not DEFINITION time
     if api_key is None:
         api_key = os.getenv("GEMINI_API_KEY", "")
@@ -29,6 +35,21 @@ def setup_vs(api_key=None, collection_name: str = "docs"):
             model= Config.EMBEDDING_MODEL
             )
 
+    if config.EMBEDDING_CACHE_ENABLED:
+        embeddings = CachedEmbeddings(embeddings, **config.get_embedding_cache_config())
+
+    backend = backend or config.VECTOR_BACKEND
+
+    if backend == "numpy":
+        # every streamlit session calls setup_vs, they all get the same instance.
+        return shared_store(
+                collection_name=collection_name,
+                embedding_function=embeddings,
+                **config.get_numpy_config()
+                )
+    if backend != "chroma":
+        raise ValueError(f"Unknown vector store backend: {backend}")
+
     return Chroma(
                 collection_name=collection_name,
         embedding_function=embeddings,
@@ -79,5 +100,31 @@ def add_documents(store, elements: List[Dict[str, Any]]):
         print(f"Added {len(docs)} documents to vector store")
 
 
-def query(store, query_text: str, k: int = 4):
+def query(store, query_text: str, k: int = QUERY_K):
     return store.similarity_search(query_text, k=k)
+
+
+def embed_queries(embeddings, query_texts: List[str]) -> List[List[float]]:
+    # one bulk call instead of one embed_query per question.
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.embed_queries(
+                query_texts,
+                lambda misses: embed_queries(embeddings.underlying, misses)
+                )
+    if isinstance(embeddings, GoogleGenerativeAIEmbeddings):
+        return embeddings.embed_documents(query_texts, task_type="RETRIEVAL_QUERY")
+    return [embeddings.embed_query(text) for text in query_texts]
+
+
+def query_batch(store, query_texts: List[str], k: int = QUERY_K) -> List[List[Document]]:
+    if not query_texts:
+        return []
+
+    query_vectors = embed_queries(store.embeddings, query_texts)
+
+    if isinstance(store, NumpyVectorStore):
+        return [
+                [doc for doc, _ in hits]
+                for hits in store.similarity_search_by_vectors(query_vectors, k=k)
+                ]
+    return [store.similarity_search_by_vector(vector, k=k) for vector in query_vectors]
@@ -0,0 +1,37 @@
+import hashlib
+import sys
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+# add the repo root to python path so "src" can be imported like app.py does.
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic embeddings that count how many texts reach them"""
+
+    def __init__(self, dim: int = 32):
+        self.dim = dim
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+        # float32 values, the same precision the stores and the cache keep.
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return self._vector(text)
+
+
+@pytest.fixture
+def fake_embeddings():
+    return FakeEmbeddings()
@@ -0,0 +1,128 @@
+import json
+import sys
+import time
+import types
+
+import pytest
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from src import batch
+from src.batch import RateLimiter, read_questions, run_batch
+from src.config import Config
+from src.numpy_store import NumpyVectorStore
+from src.vectors import query, query_batch
+
+
+TEXTS = [f"chunk number {i}" for i in range(12)]
+
+
+def write_lines(path, lines):
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_read_questions_skips_blank_lines_and_numbers_ids(tmp_path):
+    path = write_lines(tmp_path / "q.jsonl", [
+            json.dumps({"question": "first"}),
+            "",
+            json.dumps({"id": "mine", "question": "second"}),
+            json.dumps({"question": "third"}),
+            ])
+
+    questions = read_questions(path)
+    assert [(q["id"], q["question"]) for q in questions] == [("q_0", "first"), ("mine", "second"), ("q_3", "third")]
+
+
+def test_read_questions_requires_a_question(tmp_path):
+    path = write_lines(tmp_path / "q.jsonl", [json.dumps({"question": "ok"}), json.dumps({"text": "no"})])
+
+    with pytest.raises(ValueError, match="Line 2"):
+        read_questions(path)
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(600)
+
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.wait()
+    # the first call goes straight through, the next three wait 0.1s each.
+    assert 0.3 <= time.monotonic() - start < 0.6
+
+
+def test_rate_limiter_without_limit_does_not_wait():
+    limiter = RateLimiter(0)
+
+    start = time.monotonic()
+    for _ in range(100):
+        limiter.wait()
+    assert time.monotonic() - start < 0.1
+
+
+def numpy_store(tmp_path, embeddings):
+    store = NumpyVectorStore("docs", embeddings, persist_directory=str(tmp_path))
+    store.add_texts(TEXTS, ids=TEXTS)
+    return store
+
+
+def in_memory_store(tmp_path, embeddings):
+    store = InMemoryVectorStore(embeddings)
+    store.add_texts(TEXTS, ids=TEXTS)
+    return store
+
+
+@pytest.mark.parametrize("make_store", [numpy_store, in_memory_store])
+def test_query_batch_matches_query(tmp_path, fake_embeddings, make_store):
+    store = make_store(tmp_path, fake_embeddings)
+    questions = TEXTS[:3] + ["something else entirely"]
+
+    batched = query_batch(store, questions, k=3)
+    for question, docs in zip(questions, batched):
+        assert [doc.id for doc in docs] == [doc.id for doc in query(store, question, k=3)]
+
+
+@pytest.fixture
+def stub_chat(monkeypatch):
+    """Replaces src.chat so no llm gets created, fails on questions containing "boom" """
+    calls = []
+
+    def get_respo(question, results, chat_history, raise_errors=False):
+        calls.append((question, raise_errors))
+        if "boom" in question:
+            raise RuntimeError("429 Resource has been exhausted")
+        return f"answer to {question}"
+
+    monkeypatch.setitem(sys.modules, "src.chat", types.SimpleNamespace(get_respo=get_respo))
+    monkeypatch.setattr(batch, "Config", lambda: Config(MAX_REQUESTS_PER_MINUTE=0))
+    return calls
+
+
+def test_run_batch_records_errors(tmp_path, fake_embeddings, stub_chat):
+    store = numpy_store(tmp_path, fake_embeddings)
+    questions = [
+            {"id": "a", "question": TEXTS[1]},
+            {"id": "b", "question": "boom " + TEXTS[2]},
+            {"id": "c", "question": TEXTS[3]},
+            ]
+    output = tmp_path / "answers.jsonl"
+
+    assert run_batch(store, questions, str(output), concurrency=3) == 3
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+
+    # written in input order, whatever order the answers finished in.
+    assert [record["id"] for record in records] == ["a", "b", "c"]
+    assert records[0]["answer"] == f"answer to {TEXTS[1]}"
+    assert records[0]["error"] is None
+    assert records[0]["retrieved_ids"][0] == TEXTS[1]
+    assert records[1]["answer"] is None
+    assert records[1]["error"] == "RuntimeError: 429 Resource has been exhausted"
+    assert all(raise_errors for _, raise_errors in stub_chat)
+
+
+def test_run_batch_skips_the_rate_limit_without_results(tmp_path, fake_embeddings, stub_chat, monkeypatch):
+    waits = []
+    monkeypatch.setattr(RateLimiter, "wait", lambda self: waits.append(1))
+    empty_store = NumpyVectorStore("empty", fake_embeddings, persist_directory=str(tmp_path))
+
+    run_batch(empty_store, [{"id": "a", "question": "anything"}], str(tmp_path / "answers.jsonl"))
+    assert waits == []
@@ -0,0 +1,88 @@
+import pytest
+
+from src.embedding_cache import CachedEmbeddings
+
+
+def make_cache(tmp_path, embeddings, model_name="model-a", **kwargs):
+    return CachedEmbeddings(embeddings, model_name, path=str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def test_repeat_texts_skip_the_underlying_model(tmp_path, fake_embeddings):
+    cache = make_cache(tmp_path, fake_embeddings)
+
+    first = cache.embed_documents(["header", "body", "header"])
+    # the duplicate inside the call is embedded once.
+    assert fake_embeddings.calls == 2
+    assert first[0] == first[2] == fake_embeddings._vector("header")
+
+    assert cache.embed_documents(["body", "header"]) == [first[1], first[0]]
+    assert fake_embeddings.calls == 2
+
+
+def test_cache_survives_a_new_instance(tmp_path, fake_embeddings):
+    make_cache(tmp_path, fake_embeddings).embed_documents(["a", "b"])
+
+    reopened = make_cache(tmp_path, fake_embeddings)
+    fake_embeddings.calls = 0
+    assert reopened.embed_documents(["a", "b"]) == [fake_embeddings._vector("a"), fake_embeddings._vector("b")]
+    assert fake_embeddings.calls == 0
+
+
+def test_models_do_not_share_vectors(tmp_path, fake_embeddings):
+    make_cache(tmp_path, fake_embeddings, "model-a").embed_documents(["a"])
+
+    fake_embeddings.calls = 0
+    make_cache(tmp_path, fake_embeddings, "model-b").embed_documents(["a"])
+    assert fake_embeddings.calls == 1
+
+
+def test_queries_and_documents_are_cached_separately(tmp_path, fake_embeddings):
+    cache = make_cache(tmp_path, fake_embeddings)
+    cache.embed_documents(["a"])
+    cache.embed_query("a")
+    assert fake_embeddings.calls == 2
+
+    cache.embed_queries(["a"])
+    assert fake_embeddings.calls == 2
+
+
+def test_eviction_bounds_the_file(tmp_path, fake_embeddings):
+    max_bytes = 256 * 1024
+    cache = make_cache(tmp_path, fake_embeddings, max_bytes=max_bytes, memory_items=10)
+
+    for batch in range(20):
+        cache.embed_documents([f"text {batch} {i}" for i in range(100)])
+    assert cache._used_bytes() <= max_bytes
+
+    # the most recent texts are still there, the oldest were evicted.
+    fake_embeddings.calls = 0
+    cache.embed_documents(["text 19 99"])
+    assert fake_embeddings.calls == 0
+    cache.embed_documents(["text 0 0"])
+    assert fake_embeddings.calls == 1
+
+
+def test_cache_failures_do_not_break_embedding(tmp_path, fake_embeddings):
+    cache = make_cache(tmp_path, fake_embeddings)
+    cache.embed_documents(["a"])
+    cache._memory.clear()
+    cache._db.close()
+
+    assert cache.embed_documents(["a", "b"]) == [fake_embeddings._vector("a"), fake_embeddings._vector("b")]
+
+
+@pytest.mark.parametrize("make_path", [
+        lambda tmp_path: tmp_path / "missing" / "dir" / "cache.sqlite3",
+        lambda tmp_path: tmp_path / "corrupt.sqlite3",
+        ])
+def test_unusable_cache_file_disables_the_cache(tmp_path, fake_embeddings, make_path):
+    path = make_path(tmp_path)
+    if path.parent.exists():
+        path.write_bytes(b"definitely not a sqlite database" * 100)
+
+    cache = CachedEmbeddings(fake_embeddings, "model-a", path=str(path))
+    assert cache._db is None
+
+    assert cache.embed_documents(["a", "b"]) == [fake_embeddings._vector("a"), fake_embeddings._vector("b")]
+    assert cache.embed_query("q") == fake_embeddings._vector("q")
+    cache.close()
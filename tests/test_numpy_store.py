@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+
+import pytest
+
+from src import numpy_store
+from src.numpy_store import NumpyVectorStore, shared_store
+
+
+TEXTS = [f"chunk number {i}" for i in range(20)]
+
+
+def make_store(tmp_path, embeddings, dtype="float16", **kwargs):
+    return NumpyVectorStore("docs", embeddings, persist_directory=str(tmp_path), dtype=dtype, **kwargs)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_add_reload_query(tmp_path, fake_embeddings, dtype):
+    store = make_store(tmp_path, fake_embeddings, dtype)
+    ids = store.add_texts(TEXTS, [{"i": i} for i in range(len(TEXTS))])
+
+    reloaded = make_store(tmp_path, fake_embeddings, "float16")
+    assert reloaded.dtype == dtype
+
+    hits = reloaded.similarity_search(TEXTS[7], k=3)
+    assert hits[0].page_content == TEXTS[7]
+    assert hits[0].metadata == {"i": 7}
+    assert hits[0].id == ids[7]
+
+
+def test_float16_and_int8_agree(tmp_path, fake_embeddings):
+    half = make_store(tmp_path / "half", fake_embeddings, "float16")
+    quantized = make_store(tmp_path / "quantized", fake_embeddings, "int8")
+    half.add_texts(TEXTS, ids=TEXTS)
+    quantized.add_texts(TEXTS, ids=TEXTS)
+
+    queries = [fake_embeddings.embed_query(text) for text in TEXTS[:5]]
+    for a, b in zip(half.similarity_search_by_vectors(queries, k=1), quantized.similarity_search_by_vectors(queries, k=1)):
+        assert [doc.id for doc, _ in a] == [doc.id for doc, _ in b]
+
+
+def test_delete_compact_keeps_ids_and_docs_aligned(tmp_path, fake_embeddings):
+    store = make_store(tmp_path, fake_embeddings, compact_ratio=0.5)
+    ids = store.add_texts(TEXTS)
+
+    store.delete(ids[:5])
+    assert store.count == len(TEXTS)
+    assert ids[2] not in [doc.id for doc in store.similarity_search(TEXTS[2], k=len(TEXTS))]
+
+    # crosses the compact ratio, so the rows are physically removed.
+    store.delete(ids[5:10])
+    assert store.count == 10
+
+    for reopened in (store, make_store(tmp_path, fake_embeddings)):
+        docs = reopened.get_by_ids(ids)
+        assert [doc.id for doc in docs] == ids[10:]
+        assert [doc.page_content for doc in docs] == TEXTS[10:]
+        assert reopened.similarity_search(TEXTS[15], k=1)[0].id == ids[15]
+
+
+def test_replacing_an_existing_id(tmp_path, fake_embeddings):
+    store = make_store(tmp_path, fake_embeddings)
+    store.add_texts(["old text"], ids=["a"])
+    store.add_texts(["new text"], ids=["a"])
+
+    hits = store.similarity_search("old text", k=5)
+    assert [(doc.id, doc.page_content) for doc in hits] == [("a", "new text")]
+
+
+def test_duplicate_ids_in_one_call_keep_the_last(tmp_path, fake_embeddings):
+    store = make_store(tmp_path, fake_embeddings)
+    store.add_texts(["first", "second", "other"], ids=["a", "a", "b"])
+
+    hits = store.similarity_search("first", k=5)
+    assert sorted((doc.id, doc.page_content) for doc in hits) == [("a", "second"), ("b", "other")]
+
+
+def test_failed_add_leaves_store_consistent(tmp_path, fake_embeddings):
+    store = make_store(tmp_path, fake_embeddings)
+    store.add_texts(TEXTS[:5], ids=TEXTS[:5])
+
+    with pytest.raises(TypeError):
+        store.add_texts(["bad"], [{"value": object()}], ids=["bad"])
+
+    # simulate a process killed after writing vectors but before committing.
+    with open(store._version_file("vectors"), "ab") as f:
+        f.write(b"\0" * 64 * 7)
+
+    store.add_texts(TEXTS[5:10], ids=TEXTS[5:10])
+    for reopened in (store, make_store(tmp_path, fake_embeddings)):
+        for text in TEXTS[:10]:
+            assert reopened.similarity_search(text, k=1)[0].page_content == text
+
+
+def test_interrupted_compaction_is_discarded(tmp_path, fake_embeddings):
+    store = make_store(tmp_path, fake_embeddings)
+    store.add_texts(TEXTS, ids=TEXTS)
+
+    # files of a compaction that never got to commit meta.json.
+    for kind in ("vectors", "offsets", "docs", "ids"):
+        with open(store._version_file(kind, store.version + 1), "wb") as f:
+            f.write(b"partial")
+
+    reopened = make_store(tmp_path, fake_embeddings)
+    assert reopened.version == store.version
+    assert not os.path.exists(reopened._version_file("docs", store.version + 1))
+    assert reopened.similarity_search(TEXTS[3], k=1)[0].id == TEXTS[3]
+
+
+def test_offsets_are_not_rebuilt_from_docs(tmp_path, fake_embeddings):
+    store = make_store(tmp_path, fake_embeddings)
+    store.add_texts(TEXTS)
+
+    with open(os.path.join(store.path, "meta.json")) as f:
+        meta = json.load(f)
+    assert meta["count"] == len(TEXTS)
+    assert os.path.getsize(store._version_file("offsets")) == len(TEXTS) * 8
+
+
+def test_batched_search_matches_single(tmp_path, fake_embeddings, monkeypatch):
+    # small blocks so the running top-k has to merge across several of them.
+    monkeypatch.setattr("src.numpy_store.SEARCH_BLOCK_ROWS", 3)
+    monkeypatch.setattr("src.numpy_store.SEARCH_BLOCK_QUERIES", 2)
+
+    store = make_store(tmp_path, fake_embeddings)
+    store.add_texts(TEXTS, ids=TEXTS)
+
+    queries = [fake_embeddings.embed_query(text) for text in TEXTS[:5]]
+    batched = store.similarity_search_by_vectors(queries, k=4)
+    for text, hits in zip(TEXTS, batched):
+        assert hits[0][0].id == text
+        assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+        assert [doc.id for doc in store.similarity_search(text, k=4)] == [doc.id for doc, _ in hits]
+
+
+def test_unsupported_search_arguments_raise(tmp_path, fake_embeddings):
+    store = make_store(tmp_path, fake_embeddings)
+    store.add_texts(TEXTS)
+
+    with pytest.raises(ValueError):
+        store.similarity_search(TEXTS[0], filter={"source": "a.pdf"})
+
+
+def test_two_instances_share_a_directory(tmp_path, fake_embeddings):
+    a = make_store(tmp_path, fake_embeddings)
+    b = make_store(tmp_path, fake_embeddings)
+
+    a.add_texts(TEXTS[:5], ids=TEXTS[:5])
+    # b's view is stale, it has to append after a's rows rather than over them.
+    b.add_texts(TEXTS[5:10], ids=TEXTS[5:10])
+    for store in (a, b):
+        for text in TEXTS[:10]:
+            assert store.similarity_search(text, k=1)[0].id == text
+
+    # a's delete compacts into a new file set that b has to follow.
+    a.delete(TEXTS[:5])
+    assert [doc.page_content for doc in b.get_by_ids(TEXTS[:10])] == TEXTS[5:10]
+
+    b.add_texts(TEXTS[10:12], ids=TEXTS[10:12])
+    for store in (a, b, make_store(tmp_path, fake_embeddings)):
+        assert [doc.id for doc in store.get_by_ids(TEXTS)] == TEXTS[5:12]
+
+
+def test_missing_old_tombstone_file_is_tolerated(tmp_path, fake_embeddings):
+    store = make_store(tmp_path, fake_embeddings)
+    store.add_texts(TEXTS, ids=TEXTS)
+    os.remove(os.path.join(store.path, store.deleted_file))
+
+    store.delete(TEXTS[:1])
+    assert store.similarity_search(TEXTS[0], k=1)[0].id != TEXTS[0]
+
+
+@pytest.mark.skipif(numpy_store.fcntl is None, reason="needs flock")
+def test_opening_waits_for_a_writer(tmp_path, fake_embeddings):
+    writer = make_store(tmp_path, fake_embeddings)
+    writer.add_texts(TEXTS[:5], ids=TEXTS[:5])
+    vectors_path = writer._version_file("vectors")
+    committed = os.path.getsize(vectors_path)
+
+    opened = []
+    with writer._locked():
+        # a row written but not committed yet, recovery must not cut it off.
+        writer._append("vectors", committed, b"\0" * 64)
+        opener = threading.Thread(target=lambda: opened.append(make_store(tmp_path, fake_embeddings)))
+        opener.start()
+        opener.join(0.2)
+        assert opener.is_alive()
+        assert os.path.getsize(vectors_path) == committed + 64
+
+    opener.join()
+    assert opened[0].count == 5
+
+
+def test_shared_store_returns_one_instance(tmp_path, fake_embeddings):
+    a = shared_store("docs", fake_embeddings, persist_directory=str(tmp_path))
+    (tmp_path / "sub").mkdir()
+    b = shared_store("docs", fake_embeddings, persist_directory=os.path.join(str(tmp_path), "sub", ".."))
+    assert a is b
+    assert shared_store("other", fake_embeddings, persist_directory=str(tmp_path)) is not a